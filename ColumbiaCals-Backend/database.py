@@ -4,6 +4,9 @@ database.py - SQLite database setup and management for ratings
 
 import sqlite3
 import os
+import queue
+import threading
+import time
 
 DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ratings.db')
 DATABASE_PATH = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
@@ -12,11 +15,34 @@ db_dir = os.path.dirname(DATABASE_PATH)
 if db_dir and not os.path.exists(db_dir):
     os.makedirs(db_dir, exist_ok=True)
 
+# Queued rating writes, flushed in batches by a background thread
+RATING_BATCH_WINDOW_SECONDS = 0.05
+# Backoff between writer retries after a failed flush (e.g. database is locked)
+RATING_RETRY_MIN_SECONDS = 0.5
+RATING_RETRY_MAX_SECONDS = 30
+_rating_queue = queue.Queue()
+_rating_pending = threading.Event()
+_rating_flush_lock = threading.Lock()
+# Ratings taken off the queue but not yet written (retried first, in order)
+_rating_retry = []
+_rating_writer_thread = None
+
+UPSERT_RATING_SQL = '''
+    INSERT INTO ratings (device_id, hall_name, university, meal_period, rating, date)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(device_id, hall_name, university, meal_period, date)
+    DO UPDATE SET rating = excluded.rating, timestamp = CURRENT_TIMESTAMP
+'''
+
 
 def get_db_connection():
     """Get a database connection with row factory for dict-like access"""
     conn = sqlite3.connect(DATABASE_PATH)
     conn.row_factory = sqlite3.Row
+    # Per-connection tuning; WAL itself is persisted by init_db()
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=67108864')
     return conn
 
 
@@ -25,6 +51,9 @@ def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    # WAL lets readers proceed during writes and avoids a full fsync per commit
+    cursor.execute('PRAGMA journal_mode=WAL')
+
     # Create ratings table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS ratings (
@@ -46,6 +75,12 @@ def init_db():
         ON ratings(hall_name, university, meal_period, date)
     ''')
 
+    # Create index for per-date averages (all halls, optionally one university)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ratings_date
+        ON ratings(date, university, hall_name, meal_period)
+    ''')
+
     # Create index for user lookups
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_ratings_user
@@ -69,6 +104,7 @@ def get_rating_averages(university=None, meal_period=None, date=None):
     Returns:
         Dict mapping hall names to {average, count}
     """
+    _flush_before_read()
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -111,6 +147,7 @@ def get_all_rating_averages(date, university=None):
     Returns:
         Dict mapping keys (hall or university:hall) to {meal_period: {average, count}}
     """
+    _flush_before_read()
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -156,17 +193,118 @@ def submit_rating(device_id, hall_name, university, meal_period, rating, date):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        INSERT INTO ratings (device_id, hall_name, university, meal_period, rating, date)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(device_id, hall_name, university, meal_period, date)
-        DO UPDATE SET rating = ?, timestamp = CURRENT_TIMESTAMP
-    ''', (device_id, hall_name, university, meal_period, rating, date, rating))
+    cursor.execute(UPSERT_RATING_SQL, (device_id, hall_name, university, meal_period, rating, date))
 
     conn.commit()
     conn.close()
 
 
+def queue_rating(device_id, hall_name, university, meal_period, rating, date):
+    """
+    Queue a rating for the background writer instead of writing it inline
+
+    Queued ratings become visible to every read helper below, which flush the
+    queue before querying.
+    """
+    _rating_queue.put((device_id, hall_name, university, meal_period, rating, date))
+    _rating_pending.set()
+
+
+def _write_ratings_one_by_one(conn, batch):
+    """
+    Fallback when a batch insert fails: write each rating in its own transaction
+
+    Ratings the DB rejects (constraint violations) are logged and dropped so they
+    can't block valid ones. Any other error puts the unwritten ratings back in
+    front of the queue and re-raises.
+    """
+    written = 0
+    for idx, row in enumerate(batch):
+        try:
+            with conn:
+                conn.execute(UPSERT_RATING_SQL, row)
+            written += 1
+        except sqlite3.IntegrityError as e:
+            print(f"Dropping invalid queued rating {row!r}: {e}")
+        except Exception:
+            _rating_retry[:0] = batch[idx:]
+            raise
+    return written
+
+
+def flush_pending_ratings():
+    """
+    Write all queued ratings in a single transaction
+
+    Returns:
+        Number of ratings written
+    """
+    with _rating_flush_lock:
+        batch = _rating_retry[:]
+        _rating_retry.clear()
+        while True:
+            try:
+                batch.append(_rating_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if not batch:
+            return 0
+
+        try:
+            conn = get_db_connection()
+        except Exception:
+            _rating_retry[:0] = batch
+            raise
+        try:
+            try:
+                with conn:
+                    conn.executemany(UPSERT_RATING_SQL, batch)
+                return len(batch)
+            except Exception as e:
+                print(f"Batch write of {len(batch)} ratings failed ({e}), retrying one by one")
+                return _write_ratings_one_by_one(conn, batch)
+        finally:
+            conn.close()
+
+
+def _flush_before_read():
+    """Make queued ratings visible to a read without letting write errors fail it"""
+    try:
+        flush_pending_ratings()
+    except Exception as e:
+        print(f"Error flushing queued ratings before read: {e}")
+
+
+def _rating_writer_loop():
+    retry_delay = RATING_RETRY_MIN_SECONDS
+    while True:
+        _rating_pending.wait()
+        _rating_pending.clear()
+        # Let a burst of submissions pile up so they share one transaction
+        time.sleep(RATING_BATCH_WINDOW_SECONDS)
+        try:
+            flush_pending_ratings()
+            retry_delay = RATING_RETRY_MIN_SECONDS
+        except Exception as e:
+            pending = _rating_queue.qsize() + len(_rating_retry)
+            print(f"Error flushing queued ratings ({pending} pending, retrying in {retry_delay:.1f}s): {e}")
+            # Retry accepted ratings on our own instead of waiting for new traffic
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, RATING_RETRY_MAX_SECONDS)
+            if _rating_retry or not _rating_queue.empty():
+                _rating_pending.set()
+
+
+def start_rating_writer():
+    """Start the background thread that batches queued rating writes"""
+    global _rating_writer_thread
+    if _rating_writer_thread is not None and _rating_writer_thread.is_alive():
+        return
+    _rating_writer_thread = threading.Thread(target=_rating_writer_loop, daemon=True)
+    _rating_writer_thread.start()
+
+
 def get_user_rating(device_id, hall_name, university, meal_period, date):
     """
     Get a user's existing rating for a hall in the current meal period
@@ -174,6 +312,7 @@ def get_user_rating(device_id, hall_name, university, meal_period, date):
     Returns:
         Rating value if exists, None otherwise
     """
+    _flush_before_read()
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -201,6 +340,7 @@ def get_leaderboard(limit=50, meal_period=None, date=None):
     Returns:
         List of dicts with rank, anonymized name, and total_ratings
     """
+    _flush_before_read()
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -250,6 +390,7 @@ def get_user_stats(device_id, meal_period=None, date=None):
     Returns:
         Dict with rank and total_ratings
     """
+    _flush_before_read()
     conn = get_db_connection()
     cursor = conn.cursor()
     
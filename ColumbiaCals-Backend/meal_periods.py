@@ -7,22 +7,23 @@ Meal periods:
 - Dinner: after 4:00 PM
 """
 
+import time
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 # New York timezone for all meal period calculations
 NY_TZ = ZoneInfo('America/New_York')
 
 
-def get_current_meal_period():
-    """
-    Determine current meal period based on time of day in NY timezone
+def _current_minute_key():
+    """Whole minutes since the epoch, used to reuse tz math within a minute"""
+    return int(time.time() // 60)
 
-    Returns:
-        str: 'breakfast', 'lunch', or 'dinner'
-    """
-    now = datetime.now(NY_TZ)
-    hour = now.hour
+
+@lru_cache(maxsize=2)
+def _meal_period_for_minute(minute_key):
+    hour = datetime.fromtimestamp(minute_key * 60, NY_TZ).hour
 
     if hour < 11:
         return 'breakfast'
@@ -32,6 +33,21 @@ def get_current_meal_period():
         return 'dinner'
 
 
+@lru_cache(maxsize=2)
+def _date_for_minute(minute_key):
+    return datetime.fromtimestamp(minute_key * 60, NY_TZ).strftime('%Y-%m-%d')
+
+
+def get_current_meal_period():
+    """
+    Determine current meal period based on time of day in NY timezone
+
+    Returns:
+        str: 'breakfast', 'lunch', or 'dinner'
+    """
+    return _meal_period_for_minute(_current_minute_key())
+
+
 def get_current_date():
     """
     Get current date string in YYYY-MM-DD format (NY timezone)
@@ -39,7 +55,7 @@ def get_current_date():
     Returns:
         str: Date in YYYY-MM-DD format
     """
-    return datetime.now(NY_TZ).strftime('%Y-%m-%d')
+    return _date_for_minute(_current_minute_key())
 
 
 def get_meal_period_display_name(period):
@@ -7,10 +7,12 @@ Filters unrealistic results and prioritizes quality matches
 import sys
 import requests
 import json
+import orjson
 import time
 import difflib
 import argparse
 import os
+import threading
 from dotenv import load_dotenv
 
 print(f"[nutrition_api] Starting... Python: {sys.executable}", flush=True)
@@ -34,30 +36,58 @@ USDA_BASE_URL = "https://api.nal.usda.gov/fdc/v1"
 # ============================================================
 CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nutrition_cache.json")
 PERSISTENT_CACHE = {}
+# Guards PERSISTENT_CACHE and CACHE_FILE: the server's refresh thread and
+# /api/usda-search requests share them in one process
+CACHE_LOCK = threading.RLock()
+_cache_loaded = False
+_cache_dirty = False
 
 def load_persistent_cache():
-    """Load nutrition cache from file"""
-    global PERSISTENT_CACHE
-    try:
-        if os.path.exists(CACHE_FILE):
-            with open(CACHE_FILE, 'r') as f:
-                PERSISTENT_CACHE = json.load(f)
+    """Load nutrition cache from file (entries already in memory are kept)"""
+    global _cache_loaded
+    with CACHE_LOCK:
+        try:
+            if os.path.exists(CACHE_FILE):
+                with open(CACHE_FILE, 'rb') as f:
+                    loaded = orjson.loads(f.read())
+                for key, value in loaded.items():
+                    PERSISTENT_CACHE.setdefault(key, value)
                 print(f"📦 Loaded {len(PERSISTENT_CACHE)} items from persistent cache")
-        else:
-            PERSISTENT_CACHE = {}
-            print("📦 No existing cache found, starting fresh")
-    except Exception as e:
-        print(f"⚠️ Could not load cache: {e}")
-        PERSISTENT_CACHE = {}
+            else:
+                print("📦 No existing cache found, starting fresh")
+        except Exception as e:
+            print(f"⚠️ Could not load cache: {e}")
+        _cache_loaded = True
+
+def ensure_persistent_cache_loaded():
+    """Load the cache file once per process"""
+    with CACHE_LOCK:
+        if not _cache_loaded:
+            load_persistent_cache()
+
+def store_in_cache(cache_key, result):
+    """Record a lookup result in the persistent cache"""
+    global _cache_dirty
+    with CACHE_LOCK:
+        PERSISTENT_CACHE[cache_key] = result
+        _cache_dirty = True
 
 def save_persistent_cache():
-    """Save nutrition cache to file"""
-    try:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(PERSISTENT_CACHE, f, indent=2)
-        print(f"💾 Saved {len(PERSISTENT_CACHE)} items to persistent cache")
-    except Exception as e:
-        print(f"⚠️ Could not save cache: {e}")
+    """Save nutrition cache to file (skipped when nothing new was cached)"""
+    global _cache_dirty
+    with CACHE_LOCK:
+        if not _cache_dirty:
+            return
+        try:
+            payload = orjson.dumps(PERSISTENT_CACHE, option=orjson.OPT_INDENT_2)
+            tmp_file = CACHE_FILE + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_file, CACHE_FILE)
+            _cache_dirty = False
+            print(f"💾 Saved {len(PERSISTENT_CACHE)} items to persistent cache")
+        except Exception as e:
+            print(f"⚠️ Could not save cache: {e}")
 
 def get_cache_key(food_name):
     """Normalize food name for consistent cache keys"""
@@ -282,7 +312,7 @@ def search_usda_food(food_name):
                 "serving_size": "1 serving",
                 "estimated": False
             }
-            PERSISTENT_CACHE[cache_key] = result
+            store_in_cache(cache_key, result)
             return result
     
     url = f"{USDA_BASE_URL}/foods/search"
@@ -303,7 +333,7 @@ def search_usda_food(food_name):
             if not foods:
                 print(f"   ⚠️  No USDA results for '{food_name}', using keyword estimate")
                 result = get_keyword_estimate(food_name)
-                PERSISTENT_CACHE[cache_key] = result
+                store_in_cache(cache_key, result)
                 return result
             
             # Score and filter results
@@ -400,7 +430,7 @@ def search_usda_food(food_name):
             if not scored_results:
                 print(f"   ⚠️  No realistic matches for '{food_name}', using keyword estimate")
                 result = get_keyword_estimate(food_name)
-                PERSISTENT_CACHE[cache_key] = result
+                store_in_cache(cache_key, result)
                 return result
             
             # Sort by score and return best match
@@ -424,30 +454,33 @@ def search_usda_food(food_name):
                 # Similarity very low — use keyword estimate instead
                 print(f"   ⚠️  Very low similarity ({similarity:.2f}) for '{food_name}', using keyword estimate")
                 result = get_keyword_estimate(food_name)
-                PERSISTENT_CACHE[cache_key] = result
+                store_in_cache(cache_key, result)
                 return result
 
             best_match['estimated'] = is_estimated
             print(f"   ✅ Best match: {best_match['description']} ({best_match['calories']} cal, score: {best_match['score']}, estimated: {is_estimated})")
             
-            PERSISTENT_CACHE[cache_key] = best_match
+            store_in_cache(cache_key, best_match)
             return best_match
             
         else:
             print(f"   ❌ USDA API error: {response.status_code}, using keyword estimate")
             result = get_keyword_estimate(food_name)
-            PERSISTENT_CACHE[cache_key] = result
+            store_in_cache(cache_key, result)
             return result
 
     except Exception as e:
         print(f"   ❌ Error searching USDA: {e}, using keyword estimate")
         result = get_keyword_estimate(food_name)
-        PERSISTENT_CACHE[cache_key] = result
+        store_in_cache(cache_key, result)
         return result
 
-def enrich_menu_with_nutrition():
+def enrich_menu_with_nutrition(dining_halls=None):
     """
     Main function to add nutrition data to menu
+
+    Args:
+        dining_halls: Already-scraped hall list (optional, read from menu_data.json if not given)
     """
     print("\n" + "=" * 60)
     print("🥗 Adding Nutrition Data (With Persistent Caching)")
@@ -466,13 +499,16 @@ def enrich_menu_with_nutrition():
     print(f"   Output: {output_path}")
 
     # Load menu data
-    try:
-        with open(menu_data_path, 'r') as f:
-            dining_halls = json.load(f)
-        print(f"   Loaded {len(dining_halls)} dining halls from menu_data.json")
-    except FileNotFoundError:
-        print("❌ menu_data.json not found. Run scraper first.")
-        return
+    if dining_halls is None:
+        try:
+            with open(menu_data_path, 'rb') as f:
+                dining_halls = orjson.loads(f.read())
+            print(f"   Loaded {len(dining_halls)} dining halls from menu_data.json")
+        except FileNotFoundError:
+            print("❌ menu_data.json not found. Run scraper first.")
+            return
+    else:
+        print(f"   Using {len(dining_halls)} dining halls from scraper run")
     
     # ============================================================
     # Pre-scan: Count how many items need USDA lookup vs cache hits
@@ -616,9 +652,12 @@ def enrich_menu_with_nutrition():
     # Save persistent cache after processing
     save_persistent_cache()
     
-    # Save enriched data
-    with open(output_path, 'w') as f:
-        json.dump(dining_halls, f, indent=2)
+    # Save enriched data (temp file + rename so the server never reads a partial file)
+    payload = orjson.dumps(dining_halls, option=orjson.OPT_INDENT_2)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, output_path)
 
     print("\n" + "=" * 60)
     print(f"✅ Nutrition enrichment complete!")
@@ -6,7 +6,9 @@ Runs all university-specific scrapers and combines results
 
 import sys
 import os
-import json
+import orjson
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 print(f"[run_all_scrapers] Starting... Python: {sys.executable}", flush=True)
@@ -29,7 +31,17 @@ except ImportError as e:
     print(f"[run_all_scrapers] IMPORT ERROR: {e}")
     import traceback
     traceback.print_exc()
-    sys.exit(1)
+    if __name__ == "__main__":
+        sys.exit(1)
+    raise
+
+def _collect_results(future, label):
+    """Return a scraper future's results, or [] if the scraper raised"""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"\n❌ {label} scraper failed: {e}")
+        return []
 
 def run_all_scrapers():
     """Run all university scrapers and combine results"""
@@ -42,55 +54,51 @@ def run_all_scrapers():
     output_file = os.path.join(os.path.dirname(__file__), 'menu_data.json')
 
     
-    # Run Columbia scraper
-    try:
-        columbia_results = scrape_columbia()
-    except Exception as e:
-        print(f"\n❌ Columbia scraper failed: {e}")
-        columbia_results = []
-    
-    # Run Cornell scraper
-    try:
-        cornell_results = scrape_cornell()
-    except Exception as e:
-        print(f"\n❌ Cornell scraper failed: {e}")
-        cornell_results = []
+    # Run Columbia and Cornell scrapers concurrently (both are network-bound)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        columbia_future = executor.submit(scrape_columbia)
+        cornell_future = executor.submit(scrape_cornell)
+        columbia_results = _collect_results(columbia_future, "Columbia")
+        cornell_results = _collect_results(cornell_future, "Cornell")
 
     all_results.extend(columbia_results)
     all_results.extend(cornell_results)
     
-    # Save combined results
-    with open(output_file, 'w') as f:
-        json.dump(all_results, f, indent=2)
+    # Save combined results (temp file + rename so readers never see a partial file)
+    payload = orjson.dumps(all_results, option=orjson.OPT_INDENT_2)
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_file, output_file)
     
     # Print summary
     print("\n" + "=" * 60)
     print("📊 SUMMARY")
     print("=" * 60)
     
-    by_university = {}
+    by_university = defaultdict(lambda: {'open': 0, 'closed': 0, 'error': 0, 'items': 0})
     total_open = 0
     total_items = 0
     
     for result in all_results:
         uni = (result.get('university') or result.get('source') or 'unknown')
         status = result.get('status', 'unknown')
-        
-        if uni not in by_university:
-            by_university[uni] = {'open': 0, 'closed': 0, 'error': 0, 'items': 0}
+        stats = by_university[uni]
         
         if status == 'open':
-            by_university[uni]['open'] += 1
+            stats['open'] += 1
             total_open += 1
-            for meal in result.get('meals', []):
-                for station in meal.get('stations', []):
-                    count = len(station.get('items', []))
-                    by_university[uni]['items'] += count
-                    total_items += count
+            count = sum(
+                len(station.get('items', ()))
+                for meal in result.get('meals', ())
+                for station in meal.get('stations', ())
+            )
+            stats['items'] += count
+            total_items += count
         elif status == 'closed':
-            by_university[uni]['closed'] += 1
+            stats['closed'] += 1
         else:
-            by_university[uni]['error'] += 1
+            stats['error'] += 1
     
     for uni, stats in by_university.items():
         print(f"\n{uni.upper()}:")
@@ -20,24 +20,23 @@ def update_menus():
         # Run scraper (it auto-detects meal period)
         print("Step 1/2: Running scraper...")
         result1 = subprocess.run([sys.executable, 'scraper.py'], 
-                                capture_output=True, text=True, timeout=60)
+                                stdout=sys.stdout, stderr=sys.stderr, timeout=60)
         
         if result1.returncode == 0:
             print("✅ Scraper complete!")
-            print(result1.stdout)
         else:
-            print(f"❌ Scraper failed: {result1.stderr}")
+            print(f"❌ Scraper failed with code {result1.returncode}")
             return
         
         # Run nutrition API
         print("\nStep 2/2: Adding nutrition data...")
         result2 = subprocess.run([sys.executable, 'nutrition_api.py'], 
-                                capture_output=True, text=True, timeout=120)
+                                stdout=sys.stdout, stderr=sys.stderr, timeout=120)
         
         if result2.returncode == 0:
             print("✅ Nutrition data added!")
         else:
-            print(f"❌ Nutrition API failed: {result2.stderr}")
+            print(f"❌ Nutrition API failed with code {result2.returncode}")
             return
         
         print(f"\n{'='*60}")
@@ -4,22 +4,53 @@ Flask server with integrated background scheduler
 """
 
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import json
+import orjson
 import threading
-import schedule
+import atexit
 import time
-import subprocess
-import sys
 import os
-from datetime import datetime
+import re
+from datetime import datetime, timedelta, timezone
 
 # Import rating modules
-from database import init_db, get_rating_averages, get_all_rating_averages, submit_rating, get_user_rating
+from database import init_db, start_rating_writer, flush_pending_ratings, get_rating_averages, get_all_rating_averages, queue_rating, get_user_rating
 from meal_periods import get_current_meal_period, get_current_date
 from zoneinfo import ZoneInfo
 
+# Import refresh pipeline once so scheduled runs don't pay interpreter/import startup.
+# A broken pipeline must not stop the API from serving the committed menu file.
+try:
+    from run_all_scrapers import run_all_scrapers
+    SCRAPER_IMPORT_ERROR = None
+except Exception as e:
+    run_all_scrapers = None
+    SCRAPER_IMPORT_ERROR = f"{type(e).__name__}: {e}"
+    print(f"[SERVER] Scraper import failed, refresh disabled: {SCRAPER_IMPORT_ERROR}", flush=True)
+
+try:
+    import nutrition_api
+    from nutrition_api import enrich_menu_with_nutrition
+    NUTRITION_IMPORT_ERROR = None
+except Exception as e:
+    nutrition_api = None
+    enrich_menu_with_nutrition = None
+    NUTRITION_IMPORT_ERROR = f"{type(e).__name__}: {e}"
+    print(f"[SERVER] Nutrition import failed, enrichment disabled: {NUTRITION_IMPORT_ERROR}", flush=True)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Route jsonify/request.get_json through orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -30,12 +61,15 @@ NY_TZ = ZoneInfo('America/New_York')
 # Refresh diagnostics
 LAST_REFRESH_STARTED = None
 LAST_REFRESH_COMPLETED = None
-LAST_SCRAPER_OK = None
+LAST_SCRAPER_OK = False if SCRAPER_IMPORT_ERROR else None
 LAST_NUTRITION_OK = None
 LAST_NUTRITION_ERROR = None
 
 # Initialize ratings database on startup
 init_db()
+start_rating_writer()
+# The writer is a daemon thread; write anything still queued when the worker exits
+atexit.register(flush_pending_ratings)
 
 def update_menus():
     """Run all scrapers (Columbia, Cornell) and nutrition API"""
@@ -51,56 +85,37 @@ def update_menus():
 
     try:
         # Run all university scrapers
-        scraper_path = os.path.join(BASE_DIR, 'run_all_scrapers.py')
         print(f"Step 1/2: Running all scrapers...", flush=True)
-        print(f"   Python: {sys.executable}", flush=True)
-        print(f"   Script: {scraper_path}", flush=True)
-        print(f"   Exists: {os.path.exists(scraper_path)}", flush=True)
-
-        result1 = subprocess.run(
-            [sys.executable, scraper_path],
-            timeout=300,
-            cwd=BASE_DIR
-        )
-
-        print(f"   Return code: {result1.returncode}", flush=True)
-
-        if result1.returncode == 0:
+        if run_all_scrapers is None:
+            LAST_SCRAPER_OK = False
+            print(f"❌ Scrapers unavailable, skipping refresh: {SCRAPER_IMPORT_ERROR}", flush=True)
+            return
+        try:
+            scraped_halls = run_all_scrapers()
             LAST_SCRAPER_OK = True
             print("✅ All scrapers complete!")
-        else:
+            # menu_data.json is servable while nutrition enrichment runs
+            _mark_menu_ready()
+        except Exception as e:
             LAST_SCRAPER_OK = False
-            print(f"❌ Scrapers failed with code {result1.returncode}")
+            print(f"❌ Scrapers failed: {e}", flush=True)
             return
 
-        # Run nutrition API
-        nutrition_path = os.path.join(BASE_DIR, 'nutrition_api.py')
+        # Run nutrition API on the freshly scraped halls (no re-read of menu_data.json)
         print(f"\nStep 2/2: Adding nutrition data...", flush=True)
-        print(f"   Script: {nutrition_path}", flush=True)
-        print(f"   Exists: {os.path.exists(nutrition_path)}", flush=True)
 
         nutrition_ok = False
         try:
-            result2 = subprocess.run(
-                [sys.executable, nutrition_path],
-                timeout=900,
-                cwd=BASE_DIR
-            )
-
-            print(f"   Return code: {result2.returncode}", flush=True)
-
-            if result2.returncode == 0:
-                nutrition_ok = True
-                LAST_NUTRITION_OK = True
-                print("✅ Nutrition data added!")
-            else:
-                LAST_NUTRITION_OK = False
-                LAST_NUTRITION_ERROR = f"exit_code:{result2.returncode}"
-                print(f"❌ Nutrition API failed with code {result2.returncode}")
-        except subprocess.TimeoutExpired:
+            if enrich_menu_with_nutrition is None:
+                raise RuntimeError(f"nutrition_api unavailable: {NUTRITION_IMPORT_ERROR}")
+            enrich_menu_with_nutrition(scraped_halls)
+            nutrition_ok = True
+            LAST_NUTRITION_OK = True
+            print("✅ Nutrition data added!")
+        except Exception as e:
             LAST_NUTRITION_OK = False
-            LAST_NUTRITION_ERROR = "timeout"
-            print("❌ Nutrition API timed out after 900 seconds", flush=True)
+            LAST_NUTRITION_ERROR = str(e)
+            print(f"❌ Nutrition API failed: {e}", flush=True)
         
         LAST_REFRESH_COMPLETED = datetime.now(NY_TZ).isoformat()
         print(f"\n{'='*60}")
@@ -126,21 +141,13 @@ def _normalize_meal_type(meal_type: str) -> str:
     return value
 
 
-def _parse_time_to_minutes(time_str: str):
-    if not time_str:
-        return None
-    parts = time_str.strip().split()
-    if len(parts) != 2:
-        return None
-    time_part, ampm = parts
-    if ":" not in time_part:
-        return None
-    hour_str, minute_str = time_part.split(":", 1)
-    try:
-        hour = int(hour_str)
-        minute = int(minute_str)
-    except ValueError:
-        return None
+_TIME_RANGE_RE = re.compile(
+    r'^\s*(\d{1,2}):(\d{2})\s*([AP]M)\s*(?:-|–|—|to)\s*(\d{1,2}):(\d{2})\s*([AP]M)\s*$',
+    re.IGNORECASE
+)
+
+
+def _to_minutes(hour: int, minute: int, ampm: str) -> int:
     is_pm = ampm.upper() == "PM"
     if is_pm and hour != 12:
         hour += 12
@@ -152,14 +159,12 @@ def _parse_time_to_minutes(time_str: str):
 def _parse_time_range(range_str: str):
     if not range_str:
         return None
-    normalized = range_str.replace(" to ", " - ").replace("–", "-").replace("—", "-")
-    if " - " not in normalized:
-        return None
-    start_str, end_str = [s.strip() for s in normalized.split(" - ", 1)]
-    start = _parse_time_to_minutes(start_str)
-    end = _parse_time_to_minutes(end_str)
-    if start is None or end is None:
+    match = _TIME_RANGE_RE.match(range_str)
+    if not match:
         return None
+    start_hour, start_minute, start_ampm, end_hour, end_minute, end_ampm = match.groups()
+    start = _to_minutes(int(start_hour), int(start_minute), start_ampm)
+    end = _to_minutes(int(end_hour), int(end_minute), end_ampm)
     return start, end
 
 
@@ -169,24 +174,54 @@ def _is_time_in_range(current_minutes, start_minutes, end_minutes):
     return start_minutes <= current_minutes < end_minutes
 
 
-def _get_hall_current_period(hall):
+def _build_meal_ranges(meals):
+    """Pre-parse meal times into (start_minutes, end_minutes, meal_period) tuples."""
+    ranges = []
+    for meal in meals:
+        time_range = _parse_time_range(meal.get("time", ""))
+        if not time_range:
+            continue
+        start, end = time_range
+        ranges.append((start, end, _normalize_meal_type(meal.get("meal_type"))))
+    return ranges
+
+
+# (minute, {id(hall): period}); replaced whole so a dict only ever holds one minute's periods
+_hall_period_memo = (None, {})
+
+
+def _get_hall_current_period(hall, now=None):
+    global _hall_period_memo
     meals = hall.get("meals", []) if isinstance(hall, dict) else []
     if not meals:
         return get_current_meal_period()
 
-    now = datetime.now(NY_TZ)
+    if now is None:
+        now = datetime.now(NY_TZ)
     current_minutes = now.hour * 60 + now.minute
 
-    for meal in meals:
-        time_range = _parse_time_range(meal.get("time", ""))
-        if not time_range:
-            continue
-        start, end = time_range
+    memo_minute, periods = _hall_period_memo
+    if memo_minute != current_minutes:
+        periods = {}
+        _hall_period_memo = (current_minutes, periods)
+    period = periods.get(id(hall))
+    if period is not None:
+        return period
+
+    ranges = _menu_cache['meal_ranges'].get(id(hall))
+    if ranges is None:
+        ranges = _build_meal_ranges(meals)
+
+    for start, end, meal_period in ranges:
         if _is_time_in_range(current_minutes, start, end):
-            return _normalize_meal_type(meal.get("meal_type"))
+            period = meal_period
+            break
+    else:
+        # Fallback: use first meal type if none match or parseable
+        period = _normalize_meal_type(meals[0].get("meal_type"))
 
-    # Fallback: use first meal type if none match or parseable
-    return _normalize_meal_type(meals[0].get("meal_type"))
+    periods[id(hall)] = period
+    return period
 
 
 def _get_menu_file_mtime(path: str) -> float:
@@ -233,37 +268,107 @@ def _get_preferred_menu_file() -> str | None:
     return None
 
 
-def _load_menu_data():
+_EMPTY_MENU_CACHE = {
+    'path': None, 'mtime': None, 'raw': [], 'normalized': [], 'meal_ranges': {},
+    'hall_index': {}, 'halls_by_name': {},
+}
+_menu_cache = _EMPTY_MENU_CACHE
+_menu_cache_lock = threading.Lock()
+
+
+def _hall_source(hall):
+    return (hall.get("source") or hall.get("university") or "").lower()
+
+
+def _uni_matches(source, university):
+    """Whether a hall's source belongs to the requested university (Columbia includes Barnard)."""
+    if not university:
+        return True
+    if university == "columbia":
+        return source in {"columbia", "barnard"}
+    return source == university
+
+
+def _build_hall_indexes(halls):
+    """Map (source, name) and name to the first matching hall, in file order.
+
+    Barnard halls are also indexed under "columbia", since Columbia requests
+    cover both.
+    """
+    hall_index = {}
+    halls_by_name = {}
+    for hall in halls:
+        if not isinstance(hall, dict):
+            continue
+        name = hall.get("name")
+        source = _hall_source(hall)
+        halls_by_name.setdefault(name, hall)
+        hall_index.setdefault((source, name), hall)
+        if source == "barnard":
+            hall_index.setdefault(("columbia", name), hall)
+    return hall_index, halls_by_name
+
+
+def _get_menu_cache():
+    """Return the parsed menu cache, re-reading the file only when path or mtime changed.
+
+    Each reload builds a new snapshot and swaps it in whole, so readers never see
+    a raw list from one file generation paired with the normalized list of another.
+    """
+    global _menu_cache, _hall_period_memo
     path = _get_preferred_menu_file()
     if not path:
-        return []
+        raise FileNotFoundError
+    mtime = os.stat(path).st_mtime_ns
+    cache = _menu_cache
+    if cache['path'] == path and cache['mtime'] == mtime:
+        return cache
+    with _menu_cache_lock:
+        cache = _menu_cache
+        if cache['path'] == path and cache['mtime'] == mtime:
+            return cache
+        with open(path, 'rb') as f:
+            raw = orjson.loads(f.read())
+        cache = {
+            'path': path,
+            'mtime': mtime,
+            'raw': raw,
+            'normalized': [_normalize_legacy_hall(hall) for hall in raw],
+            # Keyed by id() so the served hall dicts stay free of private fields
+            'meal_ranges': {
+                id(hall): _build_meal_ranges(hall.get("meals", []))
+                for hall in raw if isinstance(hall, dict)
+            },
+        }
+        cache['hall_index'], cache['halls_by_name'] = _build_hall_indexes(raw)
+        _hall_period_memo = (None, {})
+        _menu_cache = cache
+        return cache
+
+
+def _invalidate_menu_cache():
+    global _menu_cache
+    with _menu_cache_lock:
+        _menu_cache = _EMPTY_MENU_CACHE
+
+
+def _load_menu_data():
     try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except Exception:
+        return _get_menu_cache()['raw']
+    except FileNotFoundError:
         return []
 
 
 def _find_hall_entry(hall_name, university=None):
-    data = _load_menu_data()
     if not hall_name:
         return None
-
-    def matches(hall):
-        if hall.get("name") != hall_name:
-            return False
-        if not university:
-            return True
-        uni = university.lower()
-        source = (hall.get("source") or hall.get("university") or "").lower()
-        if uni == "columbia":
-            return source in {"columbia", "barnard"}
-        return source == uni
-
-    for hall in data:
-        if matches(hall):
-            return hall
-    return None
+    try:
+        cache = _get_menu_cache()
+    except FileNotFoundError:
+        return None
+    if not university:
+        return cache['halls_by_name'].get(hall_name)
+    return cache['hall_index'].get((university.lower(), hall_name))
 
 
 def _get_hall_period_for_request(hall_name, university=None):
@@ -272,11 +377,36 @@ def _get_hall_period_for_request(hall_name, university=None):
         return _get_hall_current_period(hall)
     return get_current_meal_period()
 
+REFRESH_HOUR = 3  # Daily refresh at 3:00 AM New York time
+_scheduler_wakeup = threading.Event()
+_scheduler_shutdown = threading.Event()
+
+
+def _next_refresh_time(now=None):
+    if now is None:
+        now = datetime.now(NY_TZ)
+    next_run = now.replace(hour=REFRESH_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return next_run
+
+
+def _secs_until(next_run, now):
+    # Compare timestamps: same-tz aware subtraction ignores DST offset changes
+    return max(0.0, next_run.timestamp() - now.timestamp())
+
+
+def stop_scheduler():
+    """Wake the scheduler thread and let it exit"""
+    _scheduler_shutdown.set()
+    _scheduler_wakeup.set()
+
+
 def run_scheduler():
     """Run scheduler in background thread"""
     print("🚀 Scheduler thread starting...")
 
-    # Ensure scheduler uses New York time for 3 AM EST/EDT
+    # Keep naive local timestamps (logs, scraped_at) in New York time
     os.environ.setdefault("TZ", "America/New_York")
     try:
         time.tzset()
@@ -288,22 +418,33 @@ def run_scheduler():
     auto_refresh = (auto_refresh_raw or "true").lower() == "true"
     print(f"[SERVER] AUTO_REFRESH_ON_START={auto_refresh_raw!r} (resolved={auto_refresh})", flush=True)
 
-    if auto_refresh:
-        # Run immediately on startup
-        trigger_refresh_async()
-
-        # Schedule daily updates at 3:00 AM
-        schedule.every().day.at("03:00").do(update_menus)
-        print("⏰ Updates scheduled at 3:00 AM daily\n")
-    else:
+    if not auto_refresh:
         print("⏸️ Auto-refresh disabled (using local JSON data)\n")
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+        return
+
+    # Run immediately on startup
+    trigger_refresh_async()
+    print(f"⏰ Updates scheduled at {REFRESH_HOUR}:00 AM daily\n")
+
+    while not _scheduler_shutdown.is_set():
+        # One clock read so the target and the timeout always refer to the same 03:00
+        now = datetime.now(NY_TZ)
+        next_run = _next_refresh_time(now)
+        _scheduler_wakeup.wait(timeout=_secs_until(next_run, now))
+        _scheduler_wakeup.clear()
+        if _scheduler_shutdown.is_set():
+            break
+        if datetime.now(NY_TZ) >= next_run:
+            _run_update_menus_guarded()
 
 _refresh_lock = threading.Lock()
 _refresh_in_progress = threading.Event()
+# Set once a servable menu file exists on disk
+_menu_ready = threading.Event()
+
+def _mark_menu_ready():
+    if _get_preferred_menu_file():
+        _menu_ready.set()
 
 def _run_update_menus_guarded():
     with _refresh_lock:
@@ -313,6 +454,8 @@ def _run_update_menus_guarded():
     try:
         update_menus()
     finally:
+        _invalidate_menu_cache()
+        _mark_menu_ready()
         _refresh_in_progress.clear()
 
 def trigger_refresh_async():
@@ -377,36 +520,55 @@ print(f"[SERVER] Starting up...", flush=True)
 print(f"[SERVER] BASE_DIR: {BASE_DIR}", flush=True)
 print(f"[SERVER] MENU_FILE: {MENU_FILE}", flush=True)
 print(f"[SERVER] MENU_FILE exists: {os.path.exists(MENU_FILE)}", flush=True)
+_mark_menu_ready()
 
 # Start scheduler in background thread
 scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
 scheduler_thread.start()
+atexit.register(stop_scheduler)
 
 # Refresh can be triggered manually via /api/refresh if needed
 
+MENU_CACHE_MAX_AGE = 300  # seconds; the menu only changes at refresh time
+
+
+def _menu_response(cache):
+    """Build the /api/dining-halls response, answering conditional GETs with 304."""
+    etag = f"{os.path.basename(cache['path'])}-{cache['mtime']}"
+    last_modified = datetime.fromtimestamp(cache['mtime'] // 1_000_000_000, timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified <= since
+
+    if not_modified:
+        resp = app.response_class(status=304)
+    else:
+        resp = app.response_class(orjson.dumps(cache['normalized']), mimetype='application/json')
+    resp.set_etag(etag)
+    resp.last_modified = last_modified
+    resp.cache_control.public = True
+    resp.cache_control.max_age = MENU_CACHE_MAX_AGE
+    return resp
+
+
 @app.route('/api/dining-halls', methods=['GET'])
 def get_dining_halls():
     """Return menu data with nutrition"""
     try:
-        menu_path = _get_preferred_menu_file()
-        if not menu_path:
-            raise FileNotFoundError
-        with open(menu_path, 'r') as f:
-            data = json.load(f)
-        normalized = [_normalize_legacy_hall(hall) for hall in data]
-        return jsonify(normalized)
+        return _menu_response(_get_menu_cache())
     except FileNotFoundError:
+        # The menu files are gone, so any earlier "ready" signal is stale
+        _menu_ready.clear()
         # Trigger a refresh and wait briefly for first-time generation
         trigger_refresh_async()
-        for _ in range(15):
-            menu_path = _get_preferred_menu_file()
-            if menu_path:
-                with open(menu_path, 'r') as f:
-                    data = json.load(f)
-                normalized = [_normalize_legacy_hall(hall) for hall in data]
-                return jsonify(normalized)
-            time.sleep(1)
-        return jsonify({"error": "Menu data not available"}), 503
+        _menu_ready.wait(timeout=15)
+        try:
+            return _menu_response(_get_menu_cache())
+        except FileNotFoundError:
+            return jsonify({"error": "Menu data not available"}), 503
 
 @app.route('/api/refresh', methods=['GET'])
 def refresh_menus():
@@ -467,20 +629,18 @@ def usda_search():
     if not q:
         return jsonify({"error": "missing_query"}), 400
 
+    if nutrition_api is None:
+        return jsonify({"error": "nutrition_unavailable"}), 503
+
     try:
-        # Call nutrition_api.py in CLI search mode
-        result = subprocess.run([sys.executable, 'nutrition_api.py', '--search', q], capture_output=True, text=True, timeout=20)
-        if result.returncode == 0:
-            try:
-                return json.loads(result.stdout)
-            except Exception:
-                return jsonify({"error": "invalid_response"}), 500
-        else:
-            # Try to parse JSON error message
-            try:
-                return json.loads(result.stdout), 404
-            except Exception:
-                return jsonify({"error": "search_failed"}), 500
+        # Search in-process; the CLI mode's stdout mixes progress logs with the JSON result
+        nutrition_api.ensure_persistent_cache_loaded()
+        result = nutrition_api.search_usda_food(q)
+        # No-op unless this lookup added a new cache entry
+        nutrition_api.save_persistent_cache()
+        if result is None:
+            return jsonify({"error": "not_found"}), 404
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -509,8 +669,15 @@ def post_rating():
     if not data or not all(field in data for field in required):
         return jsonify({"error": "Missing required fields"}), 400
 
+    # Ratings are written asynchronously, so reject anything the DB would refuse now
+    for field in ['device_id', 'hall_name', 'university']:
+        if not isinstance(data[field], str) or not data[field].strip():
+            return jsonify({"error": f"{field} must be a non-empty string"}), 400
+
     # Validate rating range
     try:
+        if isinstance(data['rating'], bool):
+            raise TypeError
         rating = float(data['rating'])
     except (ValueError, TypeError):
         return jsonify({"error": "Rating must be a number"}), 400
@@ -526,7 +693,8 @@ def post_rating():
     current_date = get_current_date()
 
     try:
-        submit_rating(
+        # Written in a batch by the background writer; reads flush the queue first
+        queue_rating(
             device_id=data['device_id'],
             hall_name=data['hall_name'],
             university=data['university'].lower(),
@@ -539,7 +707,7 @@ def post_rating():
             "status": "success",
             "meal_period": meal_period,
             "rating": rating
-        })
+        }), 202
 
     except Exception as e:
         print(f"Error submitting rating: {e}")
@@ -572,19 +740,16 @@ def get_averages():
     current_date = get_current_date()
 
     try:
+        now = datetime.now(NY_TZ)
         hall_periods = {}
         menu_data = _load_menu_data()
         for hall in menu_data:
-            source = (hall.get("source") or hall.get("university") or "").lower()
-            if university:
-                if university == "columbia":
-                    if source not in {"columbia", "barnard"}:
-                        continue
-                elif source != university:
-                    continue
+            source = _hall_source(hall)
+            if not _uni_matches(source, university):
+                continue
 
             key = hall["name"] if university else f"{source}:{hall['name']}"
-            hall_periods[key] = _get_hall_current_period(hall)
+            hall_periods[key] = _get_hall_current_period(hall, now)
 
         all_ratings = get_all_rating_averages(date=current_date, university=university)
         ratings = {}